@@ -1,6 +1,7 @@
 import json
 import re
 from datetime import datetime
+from sqlite_fts_retriever import FTSRetriever
 
 # 敏感词列表及替换方式
 SENSITIVE_WORDS = ["习近平", "李克强", "李强"]
@@ -106,6 +107,9 @@ def main():
     # 输入和输出文件路径
     input_filename = "output/country.json"
     output_filename = "output/cleaned_country.json"
+    # 需要同步到的 SQLite 知识库路径（如 "policy_knowledge_base.db"），
+    # 仅在清洗该知识库对应的数据（如 output/policy.json）时设置，默认不同步
+    fts_db_path = None
 
     # Step 1: 加载数据
     data = load_json(input_filename)
@@ -122,5 +126,11 @@ def main():
     # Step 4: 保存清洗后的数据
     save_json(deduplicated_data, output_filename)
 
+    # Step 5: 增量更新 SQLite 全文索引
+    if fts_db_path:
+        retriever = FTSRetriever(fts_db_path)
+        retriever.sync_records(deduplicated_data)
+        retriever.close()
+
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,120 @@
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeLLMServer:
+    """
+    本地模拟的 ChatGLM 接口（/chat/completions），可配置延迟与失败率，
+    用于离线测试 llm_gateway 的超时、重试、合并请求与对冲请求行为。
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.2, slow_latency=2.0, slow_rate=0.0, failure_rate=0.0,
+                 fail_first=0):
+        self.latency = latency  # 正常响应延迟（秒）
+        self.slow_latency = slow_latency  # 慢响应延迟（秒）
+        self.slow_rate = slow_rate  # 慢响应比例
+        self.failure_rate = failure_rate  # 返回 503 的比例
+        self.fail_first = fail_first  # 前若干个请求固定返回 503
+        self.request_count = 0
+        self.active = 0  # 正在处理的请求数
+        self.max_active = 0  # 同时处理请求数的峰值
+        self.lock = threading.Lock()
+        self.server = ThreadingHTTPServer((host, port), self._make_handler())
+        self.server.daemon_threads = True
+        self.thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return f"http://{host}:{port}/api/paas/v4"
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if not self.path.endswith("/chat/completions"):
+                    self._send_json(404, {"error": {"code": "404", "message": "Not Found"}})
+                    return
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                with fake.lock:
+                    fake.request_count += 1
+                    fail = fake.request_count <= fake.fail_first or random.random() < fake.failure_rate
+                    fake.active += 1
+                    fake.max_active = max(fake.max_active, fake.active)
+
+                try:
+                    time.sleep(fake.slow_latency if random.random() < fake.slow_rate else fake.latency)
+                finally:
+                    with fake.lock:
+                        fake.active -= 1
+                if fail:
+                    self._send_json(503, {"error": {"code": "1305", "message": "模拟服务繁忙"}})
+                    return
+
+                question = body.get("messages", [{}])[-1].get("content", "")
+                self._send_json(200, {
+                    "id": uuid.uuid4().hex,
+                    "created": int(time.time()),
+                    "model": body.get("model", "glm-4-flash"),
+                    "choices": [{
+                        "index": 0,
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": f"模拟回答：{question[-50:]}"}
+                    }],
+                    "usage": {"prompt_tokens": len(question), "completion_tokens": 10, "total_tokens": len(question) + 10}
+                })
+
+            def _send_json(self, status, payload):
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                try:
+                    self.send_response(status)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(data)))
+                    self.end_headers()
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass  # 客户端已超时断开
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def start(self):
+        """在后台线程中启动服务"""
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="本地模拟 ChatGLM 接口")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="正常响应延迟（秒）")
+    parser.add_argument("--slow-latency", type=float, default=2.0, help="慢响应延迟（秒）")
+    parser.add_argument("--slow-rate", type=float, default=0.0, help="慢响应比例")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="返回 503 的比例")
+    parser.add_argument("--fail-first", type=int, default=0, help="前若干个请求固定返回 503")
+    args = parser.parse_args()
+
+    server = FakeLLMServer(port=args.port, latency=args.latency, slow_latency=args.slow_latency,
+                           slow_rate=args.slow_rate, failure_rate=args.failure_rate, fail_first=args.fail_first)
+    print(f"模拟接口已启动：{server.base_url}")
+    try:
+        server.server.serve_forever()
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
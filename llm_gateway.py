@@ -0,0 +1,208 @@
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import httpx
+from zhipuai import ZhipuAI, APIConnectionError, APIStatusError, APITimeoutError
+
+# 可重试的 HTTP 状态码：限流与服务端错误
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+def is_retryable(error):
+    """判断错误是否值得重试"""
+    if isinstance(error, (APIConnectionError, APITimeoutError, TimeoutError)):
+        return True
+    return isinstance(error, APIStatusError) and error.status_code in RETRYABLE_STATUS
+
+
+class LLMGateway:
+    """
+    共享的 ChatGLM 调用网关：
+    - 复用连接池的 HTTP 客户端
+    - 每次调用的整体截止时间
+    - 相同请求在途时合并为一次调用（single-flight）
+    - 带抖动的有限次数重试
+    - 首个请求超过历史延迟分位数时发出对冲请求
+    - 并发上限
+    """
+
+    def __init__(self, api_key, base_url=None, model="glm-4-flash", timeout=30.0, max_retries=2,
+                 backoff_base=0.5, backoff_max=4.0, hedge=True, hedge_percentile=95, hedge_min_samples=20,
+                 max_concurrency=8, pool_size=20):
+        self.model = model
+        self.timeout = timeout  # 每次调用的默认截止时间（秒），包含重试与对冲
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+        self.hedge_percentile = hedge_percentile
+        self.hedge_min_samples = hedge_min_samples  # 延迟样本不足时不发对冲请求
+
+        # 共享连接池，重试由网关负责，关闭 SDK 自带重试
+        self.http_client = httpx.Client(
+            limits=httpx.Limits(max_connections=pool_size, max_keepalive_connections=pool_size),
+            timeout=timeout
+        )
+        self.client = ZhipuAI(api_key=api_key, base_url=base_url, http_client=self.http_client, max_retries=0)
+
+        # 对冲请求会额外占用线程，线程数取并发上限的两倍
+        self.semaphore = threading.BoundedSemaphore(max_concurrency)
+        self.executor = ThreadPoolExecutor(max_workers=max_concurrency * 2, thread_name_prefix="llm-gateway")
+
+        self.inflight = {}
+        self.inflight_lock = threading.Lock()
+        self.latencies = deque(maxlen=500)
+        self.latency_lock = threading.Lock()
+        self.stats = {"calls": 0, "coalesced": 0, "upstream_requests": 0, "retries": 0, "hedges": 0}
+        self.stats_lock = threading.Lock()
+
+    def _count(self, name):
+        with self.stats_lock:
+            self.stats[name] += 1
+
+    def create(self, messages, model=None, timeout=None, **kwargs):
+        """
+        调用 chat.completions.create，返回值与 SDK 相同；相同的在途请求共享同一结果
+        """
+        model = model or self.model
+        timeout = timeout or self.timeout
+        deadline = time.monotonic() + timeout
+        request = {"model": model, "messages": messages, **kwargs}
+        # 无法 JSON 序列化的参数（如 SDK 对象）按字符串参与合并键
+        key = hashlib.sha256(
+            json.dumps(request, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8")
+        ).hexdigest()
+        self._count("calls")
+
+        with self.inflight_lock:
+            future = self.inflight.get(key)
+            leader = future is None
+            if leader:
+                future = Future()
+                self.inflight[key] = future
+
+        if not leader:
+            self._count("coalesced")
+            try:
+                return future.result(timeout=timeout)
+            except FutureTimeoutError:
+                raise TimeoutError(f"等待相同请求的结果超时（{timeout}s）")
+
+        try:
+            response = self._call_with_retries(request, deadline)
+            future.set_result(response)
+            return response
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self.inflight_lock:
+                self.inflight.pop(key, None)
+
+    def _call_with_retries(self, request, deadline):
+        """有限次数重试，退避时间为带完全抖动的指数退避，且不超过截止时间"""
+        for attempt in range(self.max_retries + 1):
+            try:
+                return self._hedged_call(request, deadline)
+            except Exception as e:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 and not isinstance(e, TimeoutError):
+                    # SDK 自身的读超时与截止时间同时到达，统一按超过截止时间处理
+                    raise TimeoutError("调用 ChatGLM 超过截止时间") from e
+                if attempt == self.max_retries or not is_retryable(e) or remaining <= 0:
+                    raise
+                backoff = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+                if backoff >= remaining:
+                    raise
+                self._count("retries")
+                print(f"调用 ChatGLM 失败，{backoff:.2f}s 后进行第 {attempt + 1} 次重试: {e}")
+                time.sleep(backoff)
+
+    def _hedged_call(self, request, deadline):
+        """发出请求；若超过对冲阈值仍未返回且仍有并发余量，再发出一个相同请求，取先成功者"""
+        if not self.semaphore.acquire(timeout=max(deadline - time.monotonic(), 0)):
+            raise TimeoutError("等待并发名额超时")
+        pending = {self.executor.submit(self._send, request, deadline)}
+
+        hedge_delay = self._hedge_delay()
+        if hedge_delay is not None and hedge_delay < deadline - time.monotonic():
+            done, _ = wait(pending, timeout=hedge_delay)
+            if not done and self.semaphore.acquire(blocking=False):
+                self._count("hedges")
+                pending.add(self.executor.submit(self._send, request, deadline))
+
+        error = None
+        while pending:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    # 未完成的对冲请求在后台自然结束，结果直接丢弃
+                    return future.result()
+                error = future.exception()
+        if error is not None and not pending:
+            raise error
+        raise TimeoutError("调用 ChatGLM 超过截止时间")
+
+    def _send(self, request, deadline):
+        """实际发出一次请求（调用前已获取并发名额），成功时记录延迟"""
+        try:
+            self._count("upstream_requests")
+            start = time.monotonic()
+            response = self.client.chat.completions.create(
+                timeout=max(deadline - start, 0.001), **request
+            )
+            with self.latency_lock:
+                self.latencies.append(time.monotonic() - start)
+            return response
+        finally:
+            self.semaphore.release()
+
+    def _hedge_delay(self):
+        """返回发出对冲请求前的等待时间：近期成功请求延迟的指定分位数"""
+        if not self.hedge:
+            return None
+        with self.latency_lock:
+            samples = sorted(self.latencies)
+        if len(samples) < self.hedge_min_samples:
+            return None
+        index = min(len(samples) - 1, math.ceil(self.hedge_percentile / 100 * len(samples)) - 1)
+        return samples[index]
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+        self.http_client.close()
+
+
+if __name__ == "__main__":
+    # 使用本地模拟接口离线演示：合并请求、重试与对冲
+    from fake_llm_server import FakeLLMServer
+
+    server = FakeLLMServer(latency=0.1, slow_latency=1.5, slow_rate=0.04, failure_rate=0.1).start()
+    gateway = LLMGateway(api_key="fake_api_key", base_url=server.base_url, timeout=5, hedge_min_samples=10)
+
+    def ask(question):
+        messages = [{"role": "user", "content": question}]
+        return gateway.create(messages).choices[0].message.content
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        # 8 个相同问题同时到达，只应产生一次上游调用（失败重试除外）
+        answers = list(pool.map(ask, ["广东省科技信贷风险补偿政策是什么？"] * 8))
+    print(f"相同问题并发 8 次，返回 {len(set(answers))} 种回答，统计：{gateway.stats}")
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        answers = list(pool.map(ask, [f"问题 {i}" for i in range(60)]))
+    print(f"60 个不同问题完成，耗时 {time.monotonic() - start:.2f}s，"
+          f"对冲阈值 {gateway._hedge_delay()}，统计：{gateway.stats}")
+
+    gateway.close()
+    server.stop()
@@ -1,10 +1,10 @@
 import gradio as gr
-from zhipuai import ZhipuAI
+from llm_gateway import LLMGateway
 
 class SimpleChatbot:
     def __init__(self, api_key):
-        # 初始化 ZhipuAI 客户端
-        self.client = ZhipuAI(api_key=api_key)
+        # 初始化 ZhipuAI 调用网关（连接复用、超时、重试、合并相同请求）
+        self.llm_gateway = LLMGateway(api_key=api_key)
         # 初始化对话历史
         self.conversation_history = []
 
@@ -16,7 +16,7 @@ class SimpleChatbot:
         self.conversation_history.append({"role": "user", "content": user_input})
 
         # 调用 ChatGLM 接口
-        response = self.client.chat.completions.create(
+        response = self.llm_gateway.create(
             model="glm-4-flash",
             messages=[
                 {"role": "system", "content": "你是一个政务领域的智能助手，擅长回答政策问题。"},
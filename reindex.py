@@ -0,0 +1,273 @@
+import argparse
+import json
+import time
+from datetime import datetime
+from elasticsearch import Elasticsearch
+from elasticsearch.helpers import parallel_bulk
+from text2vec import SentenceModel
+import urllib3
+
+# 忽略 SSL 警告
+urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
+
+# 聊天机器人查询的别名，实际数据存放在带版本号的索引中（如 policy_knowledge_base_v20250107172916）
+ES_ALIAS = "policy_knowledge_base"
+EMBEDDING_DIMS = 1024
+
+# 索引映射与 text2vec_elastic_main.py 保持一致
+INDEX_MAPPINGS = {
+    "properties": {
+        "title": {"type": "text"},
+        "time": {"type": "date", "format": "yyyy-MM-dd HH:mm:ss||yyyy-MM-dd||epoch_millis"},
+        "source": {"type": "text"},
+        "content": {"type": "text"},
+        "embedding": {"type": "dense_vector", "dims": EMBEDDING_DIMS}
+    }
+}
+
+
+def connect_es():
+    """连接 Elasticsearch"""
+    es = Elasticsearch(
+        "https://localhost:9200",
+        basic_auth=("elastic", "elastic_password"),  # 替换为你的认证信息
+        verify_certs=False,  # 忽略证书验证
+        request_timeout=120
+    )
+    if not es.ping():
+        raise ConnectionError("无法连接到 Elasticsearch，请检查服务是否启动。")
+    return es
+
+
+def list_versioned_indices(es):
+    """按创建时间升序列出所有带版本号的索引"""
+    indices = es.indices.get(index=f"{ES_ALIAS}_v*", allow_no_indices=True)
+    return sorted(indices, key=lambda name: int(indices[name]["settings"]["index"]["creation_date"]))
+
+
+def current_alias_targets(es):
+    """返回别名当前指向的索引列表"""
+    if not es.indices.exists_alias(name=ES_ALIAS):
+        return []
+    return list(es.indices.get_alias(name=ES_ALIAS).keys())
+
+
+def has_legacy_index(es):
+    """检查是否存在与别名同名的旧版实体索引（由 text2vec_elastic_main.py 直接创建）"""
+    return es.indices.exists(index=ES_ALIAS) and not es.indices.exists_alias(name=ES_ALIAS)
+
+
+def backup_legacy_index(es):
+    """将与别名同名的旧索引克隆为版本化索引，切换别名时删除旧索引后仍可回滚"""
+    backup = f"{ES_ALIAS}_v{datetime.now():%Y%m%d%H%M%S}_legacy"
+    # clone 要求源索引只读，克隆完成后立即解除，避免影响线上写入
+    es.indices.put_settings(index=ES_ALIAS, body={"index": {"blocks": {"write": True}}})
+    try:
+        es.indices.clone(index=ES_ALIAS, target=backup)
+    finally:
+        es.indices.put_settings(index=ES_ALIAS, body={"index": {"blocks": {"write": None}}})
+    es.indices.put_settings(index=backup, body={"index": {"blocks": {"write": None}}})
+    es.cluster.health(index=backup, wait_for_status="yellow", timeout="120s")
+    print(f"旧索引 '{ES_ALIAS}' 已克隆为 '{backup}'，可通过 --rollback 切回。")
+    return backup
+
+
+def create_load_index(es, index_name, shards):
+    """创建面向批量写入优化的新索引：关闭刷新、不设副本"""
+    es.indices.create(index=index_name, body={
+        "settings": {
+            "number_of_shards": shards,
+            "number_of_replicas": 0,
+            "refresh_interval": "-1"
+        },
+        "mappings": INDEX_MAPPINGS
+    })
+    print(f"索引 '{index_name}' 创建成功（refresh_interval=-1, number_of_replicas=0）。")
+
+
+def generate_actions(records, model, index_name, embed_batch_size, stats):
+    """分批生成嵌入向量并流式产出 bulk 动作，避免一次性在内存中构造全部文档"""
+    for start in range(0, len(records), embed_batch_size):
+        batch = records[start:start + embed_batch_size]
+        texts = [
+            f"标题: {record['title']}\n时间: {record['time']}\n来源: {record['source']}\n内容: {record['content']}"
+            for record in batch
+        ]
+        embed_start = time.perf_counter()
+        embeddings = model.encode(texts, batch_size=embed_batch_size)
+        stats["embed_seconds"] += time.perf_counter() - embed_start
+
+        for record, embedding in zip(batch, embeddings):
+            if len(embedding) != EMBEDDING_DIMS:
+                print(f"跳过记录，嵌入维度不匹配: {record['title']}")
+                stats["skipped"] += 1
+                continue
+            yield {
+                "_index": index_name,
+                "_source": {
+                    "title": record["title"],
+                    "time": record["time"],
+                    "source": record["source"],
+                    "content": record["content"],
+                    "embedding": embedding.tolist()
+                }
+            }
+
+
+def bulk_load(es, records, model, index_name, args):
+    """使用 parallel_bulk 并行写入，返回统计信息"""
+    stats = {"indexed": 0, "failed": 0, "skipped": 0, "embed_seconds": 0.0}
+    actions = generate_actions(records, model, index_name, args.embed_batch_size, stats)
+    for ok, info in parallel_bulk(
+        es,
+        actions,
+        thread_count=args.threads,
+        chunk_size=args.chunk_size,
+        max_chunk_bytes=args.max_chunk_mb * 1024 * 1024,
+        raise_on_error=False,
+        raise_on_exception=False
+    ):
+        if ok:
+            stats["indexed"] += 1
+        else:
+            stats["failed"] += 1
+            print(f"写入失败: {info}")
+    return stats
+
+
+def finalize_index(es, index_name, args):
+    """刷新并段合并，然后恢复正常的刷新间隔与副本数"""
+    es.indices.refresh(index=index_name)
+    print(f"正在对 '{index_name}' 执行 force merge（max_num_segments=1）...")
+    es.indices.forcemerge(index=index_name, max_num_segments=1)
+    es.indices.put_settings(index=index_name, body={
+        "index": {
+            "refresh_interval": args.refresh_interval,
+            "number_of_replicas": args.replicas
+        }
+    })
+    # 单节点集群无法分配副本，只要求 yellow
+    es.cluster.health(index=index_name, wait_for_status="yellow", timeout="120s")
+    print(f"已恢复索引设置（refresh_interval={args.refresh_interval}, number_of_replicas={args.replicas}）。")
+
+
+def swap_alias(es, new_index, drop_legacy=False):
+    """原子地将别名切换到新索引，旧索引保留用于回滚"""
+    actions = [{"remove": {"index": old, "alias": ES_ALIAS}} for old in current_alias_targets(es) if old != new_index]
+    if drop_legacy:
+        # 别名不能与实体索引同名，需要在同一次原子操作中删除旧版索引
+        actions.append({"remove_index": {"index": ES_ALIAS}})
+    actions.append({"add": {"index": new_index, "alias": ES_ALIAS}})
+    es.indices.update_aliases(body={"actions": actions})
+    print(f"别名 '{ES_ALIAS}' 已指向 '{new_index}'。")
+
+
+def prune_old_indices(es, keep):
+    """删除多余的历史版本，仅保留最近 keep 个（含当前版本）"""
+    active = set(current_alias_targets(es))
+    versions = list_versioned_indices(es)
+    for index_name in versions[:max(len(versions) - keep, 0)]:
+        if index_name in active:
+            continue
+        es.indices.delete(index=index_name)
+        print(f"已删除历史索引 '{index_name}'。")
+
+
+def rollback(es):
+    """将别名切回当前版本之前的最近一个索引"""
+    active = current_alias_targets(es)
+    versions = list_versioned_indices(es)
+    if not active or active[0] not in versions:
+        print(f"别名 '{ES_ALIAS}' 未指向版本化索引，无法回滚。")
+        return
+    position = versions.index(active[0])
+    if position == 0:
+        print("没有更早的索引版本可供回滚。")
+        return
+    swap_alias(es, versions[position - 1])
+
+
+def reindex(es, args):
+    """构建新版本索引并切换别名"""
+    legacy = has_legacy_index(es)
+    if legacy and not args.drop_legacy:
+        print(f"存在与别名同名的旧索引 '{ES_ALIAS}'，请确认后使用 --drop-legacy 在切换别名时将其替换。")
+        return
+    if legacy:
+        # 先于新索引创建备份，使其在版本顺序中排在新索引之前
+        backup_legacy_index(es)
+
+    with open(args.json_path, "r", encoding="utf-8") as f:
+        records = json.load(f)
+    if not records:
+        print("没有数据需要写入，请检查输入文件。")
+        return
+
+    index_name = f"{ES_ALIAS}_v{datetime.now():%Y%m%d%H%M%S}"
+    create_load_index(es, index_name, args.shards)
+
+    model = SentenceModel(args.model)
+    load_start = time.perf_counter()
+    stats = bulk_load(es, records, model, index_name, args)
+    load_seconds = time.perf_counter() - load_start
+
+    if stats["indexed"] == 0:
+        es.indices.delete(index=index_name)
+        print(f"没有数据成功写入，已删除索引 '{index_name}'，别名保持不变。")
+        return
+
+    # 部分写入的索引不应接管线上查询，超过允许的失败数时放弃切换
+    failures = stats["failed"] + stats["skipped"]
+    if failures > args.max_failures:
+        es.indices.delete(index=index_name)
+        print(
+            f"失败 {stats['failed']} 条、跳过 {stats['skipped']} 条，超过允许的 {args.max_failures} 条，"
+            f"已删除索引 '{index_name}'，别名保持不变。"
+        )
+        return
+
+    finalize_start = time.perf_counter()
+    finalize_index(es, index_name, args)
+    finalize_seconds = time.perf_counter() - finalize_start
+
+    swap_alias(es, index_name, drop_legacy=legacy)
+    prune_old_indices(es, args.keep)
+
+    bulk_seconds = max(load_seconds - stats["embed_seconds"], 1e-9)
+    print(
+        f"重建完成：写入 {stats['indexed']} 条，失败 {stats['failed']} 条，跳过 {stats['skipped']} 条。\n"
+        f"嵌入耗时 {stats['embed_seconds']:.2f}s，写入耗时 {bulk_seconds:.2f}s，"
+        f"整体吞吐 {stats['indexed'] / load_seconds:.1f} 条/秒（不含嵌入 {stats['indexed'] / bulk_seconds:.1f} 条/秒），"
+        f"合并与恢复设置耗时 {finalize_seconds:.2f}s。"
+    )
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="零停机重建政策知识库索引（版本化索引 + 别名切换）")
+    parser.add_argument("--json-path", default="output/cleaned_policy.json", help="清洗后的 JSON 数据路径")
+    parser.add_argument("--model", default="GanymedeNil/text2vec-large-chinese", help="嵌入模型")
+    parser.add_argument("--chunk-size", type=int, default=200, help="每个 bulk 请求包含的文档数")
+    parser.add_argument("--max-chunk-mb", type=int, default=20, help="每个 bulk 请求的最大字节数（MB）")
+    parser.add_argument("--threads", type=int, default=4, help="parallel_bulk 的线程数")
+    parser.add_argument("--embed-batch-size", type=int, default=64, help="每批生成嵌入向量的文档数")
+    parser.add_argument("--shards", type=int, default=1, help="新索引的主分片数")
+    parser.add_argument("--replicas", type=int, default=1, help="写入完成后恢复的副本数")
+    parser.add_argument("--refresh-interval", default="1s", help="写入完成后恢复的刷新间隔")
+    parser.add_argument("--max-failures", type=int, default=0, help="允许写入失败或跳过的最大文档数，超过则不切换别名")
+    parser.add_argument("--keep", type=int, default=2, help="保留的索引版本数（含当前版本）")
+    parser.add_argument("--drop-legacy", action="store_true", help="将与别名同名的旧索引克隆为版本化索引后，在切换别名时删除原索引")
+    parser.add_argument("--rollback", action="store_true", help="将别名切回上一个索引版本")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    es = connect_es()
+    if args.rollback:
+        rollback(es)
+    else:
+        reindex(es, args)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+try:
+    from sentence_transformers import CrossEncoder
+except ImportError:  # 未安装 sentence-transformers 时跳过重排，直接使用第一阶段的排序
+    CrossEncoder = None
+
+
+def reciprocal_rank_fusion(result_lists, key=lambda doc: doc.metadata["title"], k=60):
+    """使用 RRF 融合多路召回结果（如向量检索与 BM25），按融合得分降序返回去重后的文档"""
+    scores = {}
+    docs = {}
+    for results in result_lists:
+        for rank, doc in enumerate(results):
+            doc_key = key(doc)
+            scores[doc_key] = scores.get(doc_key, 0.0) + 1.0 / (k + rank + 1)
+            docs.setdefault(doc_key, doc)
+    return [docs[doc_key] for doc_key in sorted(scores, key=scores.get, reverse=True)]
+
+
+class CrossEncoderReranker:
+    """
+    第二阶段重排：在 CPU 上用交叉编码器为候选文档批量打分。
+    每次查询有延迟预算，预算不足时减少参与重排的候选数，负载过高时跳过重排；
+    打分结果按 (查询, 文档) 哈希缓存。
+    """
+
+    def __init__(self, model_name="BAAI/bge-reranker-base", batch_size=16, latency_budget=0.5,
+                 max_concurrency=2, cache_size=10000, max_length=512):
+        self.model = CrossEncoder(model_name, device="cpu", max_length=max_length) if CrossEncoder else None
+        if self.model is None:
+            print("未安装 sentence-transformers，将跳过重排，直接使用召回顺序。")
+        self.batch_size = batch_size
+        self.latency_budget = latency_budget  # 每次查询用于重排的时间预算（秒）
+        self.seconds_per_pair = None  # 单个 (查询, 文档) 对打分耗时的滑动平均
+
+        # 同时进行重排的查询数上限，超过时视为高负载并跳过重排
+        self.semaphore = threading.BoundedSemaphore(max_concurrency)
+
+        self.cache = OrderedDict()
+        self.cache_size = cache_size
+        self.cache_lock = threading.Lock()
+        self.stats = {"queries": 0, "skipped": 0, "pairs_scored": 0, "cache_hits": 0, "truncated": 0}
+
+    @staticmethod
+    def _cache_key(query, text):
+        return hashlib.sha1(f"{query}\x00{text}".encode("utf-8")).hexdigest()
+
+    def _cache_get(self, key):
+        with self.cache_lock:
+            score = self.cache.get(key)
+            if score is not None:
+                self.cache.move_to_end(key)
+            return score
+
+    def _cache_put(self, key, score):
+        with self.cache_lock:
+            self.cache[key] = score
+            self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+
+    def _next_batch_size(self, remaining):
+        """按剩余预算决定下一批的大小；尚无统计时只打分一个，先测出单对耗时"""
+        if self.seconds_per_pair is None:
+            return 1
+        return min(self.batch_size, max(1, int(remaining / self.seconds_per_pair)))
+
+    def rerank(self, query, docs, top_n=3):
+        """
+        对第一阶段的候选文档重排，返回最相关的 top_n 个；
+        已打分的文档按分数降序排在前面，未打分的保持召回顺序排在其后
+        """
+        self.stats["queries"] += 1
+        if self.model is None or len(docs) <= 1:
+            return docs[:top_n]
+        if not self.semaphore.acquire(blocking=False):
+            self.stats["skipped"] += 1
+            return docs[:top_n]
+
+        try:
+            deadline = time.monotonic() + self.latency_budget
+            keys = [self._cache_key(query, doc.page_content) for doc in docs]
+            scores = [self._cache_get(key) for key in keys]
+            self.stats["cache_hits"] += sum(score is not None for score in scores)
+
+            # 按召回顺序为未缓存的候选打分，预算不足时只覆盖排名靠前的部分。
+            # predict 无法中断，每批大小按剩余预算确定；首批至少打分一对，
+            # 保证打分耗时的估计在变慢后仍能持续更新并恢复
+            pending = [i for i, score in enumerate(scores) if score is None]
+            start = 0
+            while start < len(pending):
+                remaining = deadline - time.monotonic()
+                if start > 0 and remaining < self.seconds_per_pair:
+                    self.stats["truncated"] += 1
+                    break
+                batch = pending[start:start + self._next_batch_size(remaining)]
+                start += len(batch)
+                batch_start = time.monotonic()
+                batch_scores = self.model.predict(
+                    [(query, docs[i].page_content) for i in batch],
+                    batch_size=len(batch),
+                    show_progress_bar=False
+                )
+                per_pair = (time.monotonic() - batch_start) / len(batch)
+                self.seconds_per_pair = per_pair if self.seconds_per_pair is None else 0.5 * self.seconds_per_pair + 0.5 * per_pair
+                self.stats["pairs_scored"] += len(batch)
+                for i, score in zip(batch, batch_scores):
+                    scores[i] = float(score)
+                    self._cache_put(keys[i], scores[i])
+        finally:
+            self.semaphore.release()
+
+        scored = sorted((i for i, score in enumerate(scores) if score is not None), key=lambda i: scores[i], reverse=True)
+        unscored = [i for i, score in enumerate(scores) if score is None]
+        return [docs[i] for i in scored + unscored][:top_n]
@@ -0,0 +1,200 @@
+import argparse
+import json
+import logging
+import re
+import sqlite3
+import threading
+import time
+
+try:
+    import jieba
+    jieba.setLogLevel(logging.WARNING)
+except ImportError:  # 未安装 jieba 时退回到二元分词
+    jieba = None
+
+# SQLite 知识库路径及全文索引相关表名
+DB_PATH = "policy_knowledge_base.db"
+FTS_TABLE = "knowledge_base_fts"
+META_TABLE = "knowledge_base_fts_meta"
+
+# BM25 字段权重：标题命中比正文命中更重要
+TITLE_WEIGHT = 10.0
+CONTENT_WEIGHT = 1.0
+
+CJK_RUN = re.compile(r"[一-鿿]+")
+TOKEN_RUN = re.compile(r"[一-鿿]+|[a-z0-9]+")
+
+
+def ngram_tokenize(text):
+    """中文连续片段切分为重叠二元组，英文和数字按整词保留"""
+    tokens = []
+    for run in TOKEN_RUN.findall(text.lower()):
+        if CJK_RUN.fullmatch(run) and len(run) > 1:
+            tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+        else:
+            tokens.append(run)
+    return tokens
+
+
+def jieba_tokenize(text):
+    """使用 jieba 搜索引擎模式分词，去掉标点和空白"""
+    return [token for token in (t.strip().lower() for t in jieba.cut_for_search(text)) if TOKEN_RUN.search(token)]
+
+
+class FTSRetriever:
+    """基于 SQLite FTS5 与 BM25 排序的轻量级关键词检索"""
+
+    def __init__(self, db_path=DB_PATH, tokenizer=None):
+        if tokenizer is None:
+            tokenizer = "jieba" if jieba is not None else "ngram"
+        if tokenizer == "jieba" and jieba is None:
+            raise ValueError("未安装 jieba，请执行 pip install jieba 或改用 ngram 分词。")
+        if tokenizer not in ("jieba", "ngram"):
+            raise ValueError(f"不支持的分词方式: {tokenizer}")
+        self.tokenizer = tokenizer
+
+        # Gradio 在多个线程中处理请求，共享连接并用锁串行化访问
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.lock = threading.Lock()
+        self._initialize_index()
+
+    def _tokenize(self, text):
+        return jieba_tokenize(text) if self.tokenizer == "jieba" else ngram_tokenize(text)
+
+    def _segment(self, text):
+        """将文本转为空格分隔的词序列，交给 FTS5 的 unicode61 分词器索引"""
+        return " ".join(self._tokenize(text or ""))
+
+    def _initialize_index(self):
+        """创建全文索引表，分词方式变化或索引为空时从 knowledge_base 全量重建"""
+        with self.lock, self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS knowledge_base (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    title TEXT,
+                    time TEXT,
+                    source TEXT,
+                    content TEXT
+                )
+            """)
+            self.conn.execute(f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(title, content, tokenize='unicode61')")
+            self.conn.execute(f"CREATE TABLE IF NOT EXISTS {META_TABLE} (key TEXT PRIMARY KEY, value TEXT)")
+
+            row = self.conn.execute(f"SELECT value FROM {META_TABLE} WHERE key = 'tokenizer'").fetchone()
+            indexed = self.conn.execute(f"SELECT count(*) FROM {FTS_TABLE}").fetchone()[0]
+            if row is None or row[0] != self.tokenizer or indexed == 0:
+                self._rebuild()
+
+    def _rebuild(self):
+        """全量重建索引，同一标题只索引最早的一条记录（调用方需持有锁并处于事务中）"""
+        start = time.perf_counter()
+        self.conn.execute(f"DELETE FROM {FTS_TABLE}")
+        rows = self.conn.execute(
+            "SELECT id, title, content FROM knowledge_base "
+            "WHERE id IN (SELECT min(id) FROM knowledge_base GROUP BY title)"
+        ).fetchall()
+        self.conn.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, title, content) VALUES (?, ?, ?)",
+            [(row_id, self._segment(title), self._segment(content)) for row_id, title, content in rows]
+        )
+        self.conn.execute(
+            f"INSERT OR REPLACE INTO {META_TABLE} (key, value) VALUES ('tokenizer', ?)", (self.tokenizer,)
+        )
+        print(f"全文索引已重建（{self.tokenizer} 分词），共 {len(rows)} 条记录，耗时 {time.perf_counter() - start:.2f}s。")
+
+    def sync_records(self, records):
+        """按标题增量同步清洗后的记录：新增的插入，内容变化的更新，未变化的跳过"""
+        inserted = updated = unchanged = 0
+        with self.lock, self.conn:
+            for record in records:
+                row = self.conn.execute(
+                    "SELECT id, time, source, content FROM knowledge_base WHERE title = ? ORDER BY id LIMIT 1",
+                    (record["title"],)
+                ).fetchone()
+                if row is None:
+                    cursor = self.conn.execute(
+                        "INSERT INTO knowledge_base (title, time, source, content) VALUES (?, ?, ?, ?)",
+                        (record["title"], record["time"], record["source"], record["content"])
+                    )
+                    row_id = cursor.lastrowid
+                    inserted += 1
+                elif row[1:] != (record["time"], record["source"], record["content"]):
+                    row_id = row[0]
+                    self.conn.execute(
+                        "UPDATE knowledge_base SET time = ?, source = ?, content = ? WHERE id = ?",
+                        (record["time"], record["source"], record["content"], row_id)
+                    )
+                    self.conn.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid = ?", (row_id,))
+                    updated += 1
+                else:
+                    unchanged += 1
+                    continue
+                self.conn.execute(
+                    f"INSERT INTO {FTS_TABLE} (rowid, title, content) VALUES (?, ?, ?)",
+                    (row_id, self._segment(record["title"]), self._segment(record["content"]))
+                )
+        print(f"全文索引同步完成：新增 {inserted} 条，更新 {updated} 条，未变化 {unchanged} 条。")
+        return {"inserted": inserted, "updated": updated, "unchanged": unchanged}
+
+    def sync_from_json(self, json_path):
+        """从清洗输出的 JSON 文件增量同步"""
+        with open(json_path, "r", encoding="utf-8") as f:
+            records = json.load(f)
+        return self.sync_records(records)
+
+    def _build_match_query(self, query):
+        """将查询分词后组装为 FTS5 的 OR 查询，由 BM25 负责排序"""
+        terms = []
+        for token in dict.fromkeys(self._tokenize(query)):
+            term = '"' + token.replace('"', '""') + '"'
+            # 二元分词下单个汉字不会被单独索引，改用前缀匹配
+            if self.tokenizer == "ngram" and len(token) == 1 and CJK_RUN.fullmatch(token):
+                term += "*"
+            terms.append(term)
+        return " OR ".join(terms)
+
+    def search(self, query, top_k=5):
+        """检索与查询最相关的记录，score 越大越相关"""
+        match_query = self._build_match_query(query)
+        if not match_query:
+            return []
+        with self.lock:
+            rows = self.conn.execute(
+                f"SELECT kb.id, kb.title, kb.time, kb.source, kb.content, "
+                f"bm25({FTS_TABLE}, {TITLE_WEIGHT}, {CONTENT_WEIGHT}) AS rank "
+                f"FROM {FTS_TABLE} JOIN knowledge_base kb ON kb.id = {FTS_TABLE}.rowid "
+                f"WHERE {FTS_TABLE} MATCH ? ORDER BY rank LIMIT ?",
+                (match_query, top_k)
+            ).fetchall()
+        return [
+            {"id": row_id, "title": title, "time": time_, "source": source, "content": content, "score": -rank}
+            for row_id, title, time_, source, content, rank in rows
+        ]
+
+    def close(self):
+        self.conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="基于 SQLite FTS5 的政策知识库关键词检索")
+    parser.add_argument("query", nargs="?", help="检索关键词")
+    parser.add_argument("--db", default=DB_PATH, help="SQLite 知识库路径")
+    parser.add_argument("--tokenizer", choices=["jieba", "ngram"], help="分词方式，默认优先使用 jieba")
+    parser.add_argument("--sync", metavar="JSON_PATH", help="从清洗后的 JSON 文件增量更新索引")
+    parser.add_argument("--top-k", type=int, default=5, help="返回结果数")
+    args = parser.parse_args()
+
+    retriever = FTSRetriever(args.db, args.tokenizer)
+    if args.sync:
+        retriever.sync_from_json(args.sync)
+    if args.query:
+        start = time.perf_counter()
+        results = retriever.search(args.query, args.top_k)
+        print(f"检索耗时 {(time.perf_counter() - start) * 1000:.1f}ms，共 {len(results)} 条结果：")
+        for result in results:
+            print(f"Score: {result['score']:.3f}, Title: {result['title']}")
+    retriever.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import pytest
+from fake_llm_server import FakeLLMServer
+from llm_gateway import LLMGateway
+
+
+@pytest.fixture
+def make_gateway():
+    """启动本地模拟接口并创建指向它的网关，测试结束后统一关闭"""
+    created = []
+
+    def factory(server_options=None, **gateway_options):
+        server = FakeLLMServer(**(server_options or {})).start()
+        gateway_options.setdefault("timeout", 5)
+        gateway = LLMGateway(api_key="fake_api_key", base_url=server.base_url, **gateway_options)
+        created.append((server, gateway))
+        return server, gateway
+
+    yield factory
+    for server, gateway in created:
+        gateway.close()
+        server.stop()
+
+
+def ask(gateway, question):
+    return gateway.create([{"role": "user", "content": question}]).choices[0].message.content
+
+
+def test_identical_concurrent_prompts_are_coalesced(make_gateway):
+    server, gateway = make_gateway({"latency": 0.3})
+    barrier = threading.Barrier(8)
+
+    def worker(_):
+        barrier.wait()
+        return ask(gateway, "广东省科技信贷风险补偿政策是什么？")
+
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        answers = list(pool.map(worker, range(8)))
+
+    assert len(set(answers)) == 1
+    assert gateway.stats["upstream_requests"] == 1
+    assert gateway.stats["coalesced"] == 7
+    assert server.request_count == 1
+
+
+def test_503_is_retried(make_gateway):
+    server, gateway = make_gateway({"latency": 0.01, "fail_first": 1}, backoff_base=0.01)
+
+    assert ask(gateway, "问题").startswith("模拟回答")
+    assert gateway.stats["retries"] == 1
+    assert gateway.stats["upstream_requests"] == 2
+    assert server.request_count == 2
+
+
+def test_call_fails_with_timeout_error_past_deadline(make_gateway):
+    _, gateway = make_gateway({"latency": 1.0}, timeout=0.3)
+
+    with pytest.raises(TimeoutError):
+        ask(gateway, "问题")
+
+
+def test_slow_request_triggers_hedge(make_gateway):
+    server, gateway = make_gateway({"latency": 0.02}, hedge_min_samples=3)
+    for i in range(3):
+        ask(gateway, f"预热 {i}")
+
+    server.latency = 0.5
+    ask(gateway, "慢问题")
+
+    assert gateway.stats["hedges"] == 1
+    assert server.request_count == 5
+
+
+def test_concurrency_cap_is_respected(make_gateway):
+    server, gateway = make_gateway({"latency": 0.2}, max_concurrency=2, hedge=False)
+
+    with ThreadPoolExecutor(max_workers=6) as pool:
+        answers = list(pool.map(lambda i: ask(gateway, f"问题 {i}"), range(6)))
+
+    assert len(answers) == 6
+    assert server.max_active == 2
@@ -5,19 +5,39 @@ from elasticsearch import Elasticsearch
 from elasticsearch.helpers import bulk
 from text2vec import SentenceModel
 from langchain.schema import Document
-from zhipuai import ZhipuAI
+from sqlite_fts_retriever import DB_PATH, FTSRetriever
+from llm_gateway import LLMGateway
+from reranker import CrossEncoderReranker, reciprocal_rank_fusion
 import urllib3
 
 # 忽略 SSL 警告
 urllib3.disable_warnings(urllib3.exceptions.InsecureRequestWarning)
 
-# Elasticsearch 索引名
+# Elasticsearch 索引名（使用 reindex.py 重建后为指向版本化索引的别名）
 ES_INDEX = "policy_knowledge_base"
 
 class ChatbotWithRAG:
-    def __init__(self, json_path, api_key):
-        # 初始化 ZhipuAI 客户端
-        self.client = ZhipuAI(api_key=api_key)
+    def __init__(self, json_path, api_key, db_path=DB_PATH, es_timeout=3,
+                 retrieval_mode="hybrid", candidate_k=20, top_n=3, rerank_budget=0.5):
+        # 初始化 ZhipuAI 调用网关（连接复用、超时、重试、合并相同请求）
+        self.llm_gateway = LLMGateway(api_key=api_key)
+
+        # 初始化对话历史
+        self.conversation_history = ""
+
+        # 初始化 SQLite 全文检索，作为 Elasticsearch 不可用或超时时的后备
+        self.fts_retriever = FTSRetriever(db_path) if os.path.exists(db_path) else None
+        self.es_timeout = es_timeout
+        if retrieval_mode not in ("vector", "bm25", "hybrid"):
+            raise ValueError(f"不支持的检索方式: {retrieval_mode}")
+        if retrieval_mode == "bm25" and self.fts_retriever is None:
+            raise ValueError(f"BM25 检索需要 SQLite 知识库 '{db_path}'。")
+
+        # 两阶段检索：第一阶段召回 candidate_k 个候选，第二阶段重排后只保留 top_n 个交给大模型
+        self.retrieval_mode = retrieval_mode
+        self.candidate_k = candidate_k
+        self.top_n = top_n
+        self.reranker = CrossEncoderReranker(latency_budget=rerank_budget)
 
         # 初始化 Elasticsearch 客户端
         self.es = Elasticsearch(
@@ -26,19 +46,24 @@ class ChatbotWithRAG:
             verify_certs=False  # 忽略证书验证
         )
         if not self.es.ping():
-            raise ConnectionError("无法连接到 Elasticsearch，请检查服务是否启动。")
+            if self.fts_retriever is None:
+                raise ConnectionError("无法连接到 Elasticsearch，请检查服务是否启动。")
+            print("无法连接到 Elasticsearch，将仅使用 SQLite 全文检索。")
+            self.es = None
+            return
 
         # 初始化嵌入模型
         self.embedding_model = SentenceModel("GanymedeNil/text2vec-large-chinese")
 
-        # 创建或检查 Elasticsearch 索引
-        self._initialize_index()
-
-        # 加载 JSON 数据并存储到 Elasticsearch
-        self._load_json_to_es(json_path)
+        if self.es.indices.exists_alias(name=ES_INDEX):
+            # 索引由 reindex.py 以别名方式维护，直接查询别名，不再重复写入
+            print(f"'{ES_INDEX}' 为别名，跳过索引初始化与数据加载，如需更新数据请运行 reindex.py。")
+        else:
+            # 创建或检查 Elasticsearch 索引
+            self._initialize_index()
 
-        # 初始化对话历史
-        self.conversation_history = ""
+            # 加载 JSON 数据并存储到 Elasticsearch
+            self._load_json_to_es(json_path)
 
     def _initialize_index(self):
         """初始化 Elasticsearch 索引"""
@@ -104,7 +129,46 @@ class ChatbotWithRAG:
         else:
             print("没有数据插入到 Elasticsearch，请检查输入文件。")
 
+    @staticmethod
+    def _to_document(source):
+        """将检索结果转换为 Document"""
+        return Document(
+            page_content=f"标题: {source['title']}\n时间: {source['time']}\n来源: {source['source']}\n内容: {source['content']}",
+            metadata={"title": source["title"], "time": source["time"], "source": source["source"]}
+        )
+
+    def retrieve_documents_lexical(self, query, top_k=5):
+        """
+        使用 SQLite FTS5 按 BM25 检索相关文档
+        """
+        return [self._to_document(result) for result in self.fts_retriever.search(query, top_k)]
+
+    def retrieve_candidates(self, query):
+        """
+        第一阶段：按检索方式召回较宽的候选集，Elasticsearch 不可用或超时时退回到 SQLite 全文检索
+        """
+        if self.es is None or self.retrieval_mode == "bm25":
+            return self.retrieve_documents_lexical(query, self.candidate_k)
+        try:
+            vector_docs = self.retrieve_documents_vector(query, self.candidate_k)
+        except Exception as e:
+            if self.fts_retriever is None:
+                raise
+            print(f"向量检索失败，改用全文检索: {e}")
+            return self.retrieve_documents_lexical(query, self.candidate_k)
+        if self.retrieval_mode == "hybrid" and self.fts_retriever is not None:
+            lexical_docs = self.retrieve_documents_lexical(query, self.candidate_k)
+            return reciprocal_rank_fusion([vector_docs, lexical_docs])[:self.candidate_k]
+        return vector_docs
+
     def retrieve_documents(self, query):
+        """
+        两阶段检索：召回候选后在 CPU 上用交叉编码器重排，只返回最相关的 top_n 个文档
+        """
+        candidates = self.retrieve_candidates(query)
+        return self.reranker.rerank(query, candidates, self.top_n)
+
+    def retrieve_documents_vector(self, query, size=5):
         """
         使用 Elasticsearch 检索相关文档
         """
@@ -123,15 +187,10 @@ class ChatbotWithRAG:
         }
 
         # 执行查询
-        response = self.es.search(index=ES_INDEX, body={"size": 5, "query": script_query})
-        docs = []
-        for hit in response["hits"]["hits"]:
-            source = hit["_source"]
-            docs.append(Document(
-                page_content=f"标题: {source['title']}\n时间: {source['time']}\n来源: {source['source']}\n内容: {source['content']}",
-                metadata={"title": source["title"], "time": source["time"], "source": source["source"]}
-            ))
-        return docs
+        response = self.es.options(request_timeout=self.es_timeout).search(
+            index=ES_INDEX, body={"size": size, "query": script_query}
+        )
+        return [self._to_document(hit["_source"]) for hit in response["hits"]["hits"]]
 
     def generate_response(self, query):
         """
@@ -149,7 +208,7 @@ class ChatbotWithRAG:
         )
 
         # 调用 ChatGLM 接口
-        response = self.client.chat.completions.create(
+        response = self.llm_gateway.create(
             model="glm-4-flash",
             messages=[
                 {"role": "system", "content": "你是一个政务领域的智能助手，擅长回答政策问题。"},